@@ -1,58 +1,282 @@
 import os
 import smtplib
+import threading
+from time import monotonic
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
-from datetime import datetime
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+from datetime import date, datetime, time
 from firebase_admin import firestore
+from google.api_core.exceptions import AlreadyExists
 from dotenv import load_dotenv
 from utils import format_date, show_footer
 
 load_dotenv()
 
+# Authentication check before any Firestore handles are created
+if not st.session_state.get("doctor_email"):
+    st.title("Dental Supply Tracker")
+    st.error("Doctor Authentication Required: Please log in to access the inventory system")
+    show_footer()
+    st.stop()
+
 # Initialize Firestore database connection
 database = firestore.client()
-doctor_email = st.session_state["doctor_email"] if "doctor_email" in st.session_state else None
-stock_collection = database.collection("doctors").document(doctor_email).collection("stock") if doctor_email else None
+doctor_email = st.session_state["doctor_email"]
 
+# Number of inventory rows sent to the browser per table page
+INVENTORY_PAGE_SIZE = 50
 
-def fetch_stock():
-    """Fetch all inventory items from Firestore database"""
-    stock_documents = stock_collection.stream()
-    return {doc.id: doc.to_dict() for doc in stock_documents}
+# Largest number of slices drawn in the inventory distribution chart
+DISTRIBUTION_CHART_ITEMS = 100
 
+# Stock listeners idle for longer than this many seconds are unsubscribed
+STOCK_LISTENER_TTL = 3600
 
-def store_stock(item_name, item_quantity, expiry_date, low_threshold=5):
-    """Store or update inventory item in Firestore database"""
-    # Check if item with same name and expiry date already exists
-    item_doc = stock_collection.document(item_name).get()
-    if item_doc.exists:
-        st.warning(f"Item '{item_name.split('_')[0]}' with the same expiry date already exists. Please edit the existing item instead.")
-        return False
+# Seconds to read stock directly after a listener fails before starting a new one
+STOCK_LISTENER_RETRY_DELAY = 300
+
+# Most stock listeners kept open at once across all doctors
+STOCK_LISTENER_MAX_ENTRIES = 20
+
+# Longest alert table rendered as static HTML before switching to a scrollable grid
+ALERT_TABLE_MAX_ROWS = 20
+
+# Seconds before cached report figures and exports expire
+REPORT_CACHE_TTL = 600
+
+# Most inventory states kept in each report figure and export cache
+REPORT_CACHE_MAX_ENTRIES = 50
+
+# Report charts are rendered as static images without interaction handlers
+STATIC_CHART_CONFIG = {"staticPlot": True, "displayModeBar": False}
+
+
+def get_stock_collection(doctor_email):
+    """Get the Firestore stock collection of a doctor"""
+    return database.collection("doctors").document(doctor_email).collection("stock")
+
+
+def parse_stock(details):
+    """Normalize a stock document so expiry dates are always naive datetimes"""
+    expiry_date = details["expiry_date"]
+    # Items stored before expiry dates became Firestore timestamps hold "YYYY-MM-DD" strings
+    if isinstance(expiry_date, str):
+        expiry_date = datetime.strptime(expiry_date, "%Y-%m-%d")
+    details["expiry_date"] = expiry_date.replace(tzinfo=None)
+    return details
+
+
+@st.cache_resource
+def stock_listeners():
+    """Registry of running stock listeners keyed by doctor email, shared by all sessions"""
+    return {"listeners": {}, "failures": {}, "lock": threading.Lock()}
+
+
+def start_stock_listener(doctor_email):
+    """Start a Firestore snapshot listener that keeps an in-memory copy of the doctor's stock"""
+    stock_cache = {"items": {}, "invalid": set(), "lock": threading.Lock(), "ready": threading.Event()}
+
+    def on_snapshot(documents, changes, read_time):
+        # Apply only the changed documents to the local copy
+        with stock_cache["lock"]:
+            for change in changes:
+                item_id = change.document.id
+                stock_cache["items"].pop(item_id, None)
+                stock_cache["invalid"].discard(item_id)
+                if change.type.name == "REMOVED":
+                    continue
+                # An exception escaping this callback would end the listener's consumer thread
+                try:
+                    stock_cache["items"][item_id] = parse_stock(change.document.to_dict())
+                except (KeyError, TypeError, ValueError, AttributeError):
+                    stock_cache["invalid"].add(item_id)
+        stock_cache["ready"].set()
+
+    stock_cache["watch"] = get_stock_collection(doctor_email).on_snapshot(on_snapshot)
+    return stock_cache
+
+
+def close_stock_listener(listeners, email):
+    """Unsubscribe a doctor's stock listener and drop it from the registry"""
+    listeners.pop(email)["watch"].unsubscribe()
+
+
+def watch_stock(doctor_email):
+    """Get the running stock listener of a doctor, restarting it if it has shut down"""
+    registry = stock_listeners()
+    with registry["lock"]:
+        listeners = registry["listeners"]
+        now = monotonic()
+
+        # Close listeners that have shut down or have not been read recently
+        for email, stock_cache in list(listeners.items()):
+            if not stock_cache["watch"].is_active or (email != doctor_email and now - stock_cache["last_used"] > STOCK_LISTENER_TTL):
+                close_stock_listener(listeners, email)
+
+        if doctor_email not in listeners:
+            # Make room by closing the least recently used listener
+            if len(listeners) >= STOCK_LISTENER_MAX_ENTRIES:
+                close_stock_listener(listeners, min(listeners, key=lambda email: listeners[email]["last_used"]))
+            listeners[doctor_email] = start_stock_listener(doctor_email)
+
+        stock_cache = listeners[doctor_email]
+        stock_cache["last_used"] = now
+        return stock_cache
+
+
+def fail_stock_listener(doctor_email):
+    """Close a doctor's failed stock listener and hold off restarting it for a while"""
+    registry = stock_listeners()
+    with registry["lock"]:
+        if doctor_email in registry["listeners"]:
+            close_stock_listener(registry["listeners"], doctor_email)
+        registry["failures"][doctor_email] = monotonic()
+
+
+def stock_listener_failed(doctor_email):
+    """Check whether a doctor's stock listener failed within the retry delay"""
+    registry = stock_listeners()
+    with registry["lock"]:
+        failed_at = registry["failures"].get(doctor_email)
+        if failed_at is not None and monotonic() - failed_at >= STOCK_LISTENER_RETRY_DELAY:
+            del registry["failures"][doctor_email]
+            failed_at = None
+        return failed_at is not None
+
+
+def update_stock_cache(item_name, item_data=None):
+    """Apply a local write to the listener cache so it is visible before the snapshot arrives"""
+    registry = stock_listeners()
+    with registry["lock"]:
+        stock_cache = registry["listeners"].get(doctor_email)
+    # Without a running listener the next read goes straight to Firestore and sees the write
+    if stock_cache is None:
+        return
+    with stock_cache["lock"]:
+        if item_data is None:
+            stock_cache["items"].pop(item_name, None)
+        else:
+            stock_cache["items"][item_name] = parse_stock({**stock_cache["items"].get(item_name, {}), **item_data})
+
+
+def read_stock(doctor_email):
+    """Read the doctor's stock collection directly, skipping documents that cannot be parsed"""
+    inventory_data, invalid_items = {}, set()
+    for doc in get_stock_collection(doctor_email).stream():
+        try:
+            inventory_data[doc.id] = parse_stock(doc.to_dict())
+        except (KeyError, TypeError, ValueError, AttributeError):
+            invalid_items.add(doc.id)
+    return inventory_data, invalid_items
+
+
+def fetch_stock(doctor_email):
+    """Fetch all inventory items from the listener cache as a DataFrame indexed by item ID"""
+    stock_cache = None
+    if not stock_listener_failed(doctor_email):
+        stock_cache = watch_stock(doctor_email)
+        # Wait for the initial snapshot on the first read after the listener starts
+        if not stock_cache["ready"].wait(timeout=10) or not stock_cache["watch"].is_active:
+            fail_stock_listener(doctor_email)
+            stock_cache = None
+
+    if stock_cache is not None:
+        with stock_cache["lock"]:
+            inventory_data = dict(stock_cache["items"])
+            invalid_items = set(stock_cache["invalid"])
+    else:
+        # Never report an empty inventory because the listener failed; read directly until the retry delay passes
+        st.warning("Live inventory updates are unavailable right now. Showing the inventory as of this page load.")
+        inventory_data, invalid_items = read_stock(doctor_email)
+
+    if invalid_items:
+        st.error(f"Skipped inventory items with an invalid expiry date: {', '.join(sorted(invalid_items))}")
+
+    # Store each field as one column so aggregates run over contiguous arrays
+    inventory_df = pd.DataFrame.from_dict(inventory_data, orient="index")
+    inventory_df = inventory_df.reindex(columns=["quantity", "expiry_date", "low_threshold"])
+    return inventory_df.astype({"quantity": "int64"}).assign(expiry_date=lambda df: pd.to_datetime(df["expiry_date"]))
+
+
+@st.cache_data(ttl=60)
+def fetch_doctor(doctor_email):
+    """Fetch the doctor profile holding alert settings (cached per doctor)"""
+    doctor_doc = database.collection("doctors").document(doctor_email).get()
+    return doctor_doc.to_dict() if doctor_doc.exists else None
 
-    stock_collection.document(item_name).set({
+
+def store_stock(item_name, item_quantity, expiry_date, low_threshold=5):
+    """Store new inventory item in Firestore database"""
+    item_data = {
         "quantity": item_quantity,
         "expiry_date": expiry_date,
         "low_threshold": low_threshold
-    }, merge=True)
-    return True
-
-
-def modify_stock(item_name, quantity_remove):
-    """Decrease quantity or remove item from inventory"""
-    item_reference = stock_collection.document(item_name)
-    item_document = item_reference.get()
+    }
+    # Create fails if an item with same name and expiry date already exists, avoiding a separate read
+    try:
+        get_stock_collection(doctor_email).document(item_name).create(item_data)
+    except AlreadyExists:
+        st.warning(f"Item '{item_name.split('_')[0]}' with the same expiry date already exists. Please edit the existing item instead.")
+        return False
 
-    if item_document.exists:
-        item_data = item_document.to_dict()
-        current_quantity = item_data["quantity"]
+    update_stock_cache(item_name, item_data)
+    return True
 
-        # Update quantity if there are enough units
-        item_reference.update({"quantity": current_quantity - quantity_remove})
-        st.success(f"Quantity Updated: {quantity_remove} units of '{item_name}' removed")
 
-        # Immediately update the inventory data in session state
-        st.session_state.inventory_data = fetch_stock()
+def replace_stock(old_item_name, new_item_name, item_data):
+    """Move an inventory item to a new document ID in a single batched write"""
+    stock_collection = get_stock_collection(doctor_email)
+    batch = database.batch()
+    batch.set(stock_collection.document(new_item_name), item_data, merge=True)
+    batch.delete(stock_collection.document(old_item_name))
+    batch.commit()
+    update_stock_cache(new_item_name, item_data)
+    update_stock_cache(old_item_name)
+
+
+def build_inventory_frame(inventory_data, today):
+    """Add the derived columns shared by all tabs to the inventory DataFrame"""
+    inventory_df = inventory_data.copy()
+    # Whole days until expiry, computed once for every tab as a single datetime64 subtraction
+    inventory_df["days_left"] = (inventory_df["expiry_date"].dt.normalize() - pd.Timestamp(today)).dt.days
+    inventory_df["expiry_label"] = inventory_df["expiry_date"].map(format_date)
+    # Extract base name from item ID (removing the _date suffix)
+    inventory_df["item_name"] = inventory_df.index.astype(str).str.split("_").str[0].str.capitalize()
+    return inventory_df
+
+
+def build_inventory_records(inventory_df):
+    """Build the inventory status table sorted so that alerts come first"""
+    low_threshold = inventory_df["low_threshold"].fillna(5)
+
+    # Later conditions take precedence, matching the order statuses are applied in
+    status = np.select(
+        [
+            inventory_df["quantity"] == 0,
+            inventory_df["days_left"] <= 0,
+            inventory_df["quantity"] <= low_threshold,
+            inventory_df["days_left"] <= 30
+        ],
+        ["❌ Out of Stock", "❌ Expired", "🚨 Low Stock", "⚠️ Expiring Soon"],
+        default="Normal"
+    )
+
+    records_df = pd.DataFrame({
+        "Item": inventory_df["item_name"],
+        "Quantity": inventory_df["quantity"],
+        "Expiry Date": inventory_df["expiry_label"],
+        "Days Until Expiry": inventory_df["days_left"],
+        "Status": status,
+        "ID": inventory_df.index  # Store the original ID for reference
+    })
+
+    priorities = {"❌ Expired": 0, "❌ Out of Stock": 1, "🚨 Low Stock": 2, "⚠️ Expiring Soon": 3, "Normal": 4}
+    status_priority = records_df["Status"].map(priorities)
+    return records_df.iloc[np.argsort(status_priority.to_numpy(), kind="stable")].reset_index(drop=True)
 
 
 def send_alert(email, expiry_items, days_threshold):
@@ -105,39 +329,48 @@ Dental Supply Tracker
 def main():
     st.title("Dental Supply Tracker")
 
-    # Authentication check
-    if st.session_state.get("doctor_email") is None:
-        st.error("Doctor Authentication Required: Please log in to access the inventory system")
+    # Compute today's date once per rerun and pass it to every section that needs it
+    today = date.today()
+
+    # Read inventory data from the snapshot listener's in-memory copy
+    st.session_state.inventory_data = fetch_stock(doctor_email)
+    # Keep a set of item IDs for the existence checks made by the add and edit forms
+    st.session_state.item_ids = frozenset(st.session_state.inventory_data.index)
+
+    # Empty inventory only needs the add form, so skip building the tabs, tables and charts
+    if st.session_state.inventory_data.empty:
+        st.info("Inventory Status: No items currently in stock. Add your first item below.")
+        with st.container(border=True):
+            st.subheader("Add Inventory", divider="blue")
+            add_items(today)
         return
 
-    # Initialize inventory data in session state if not already present
-    if 'inventory_data' not in st.session_state:
-        st.session_state.inventory_data = fetch_stock()
+    # Build the inventory DataFrame and status table once and share them across all tabs
+    inventory_df = build_inventory_frame(st.session_state.inventory_data, today)
+    records_df = build_inventory_records(inventory_df)
 
     # Create the main tabs
     tab_inventory, tab_alerts, tab_reports = st.tabs(["Inventory", "Alerts", "Reports"])
 
     # Tab 1: Inventory
     with tab_inventory:
-        # Refresh inventory data on each run to ensure it's up-to-date
-        st.session_state.inventory_data = fetch_stock()
-        display_inventory()
+        display_inventory(records_df, today)
 
     # Tab 2: Alerts
     with tab_alerts:
-        display_alerts()
+        display_alerts(inventory_df)
 
     # Tab 3: Reports
     with tab_reports:
-        display_reports()
+        display_reports(inventory_df, records_df, today)
 
 
-def display_inventory():
+def display_inventory(records_df, today):
     """Display and manage the inventory tab"""
     st.header("Current Inventory")
 
     # Display full inventory table first
-    show_inventory()
+    show_inventory(records_df)
 
     # Inventory management options below the table
     st.subheader("Inventory Management")
@@ -147,12 +380,12 @@ def display_inventory():
     with col_add:
         with st.container(border=True):
             st.subheader("Add Inventory", divider="blue")
-            add_items()
+            add_items(today)
 
     with col_edit:
         with st.container(border=True):
             st.subheader("Edit Inventory", divider="orange")
-            edit_inventory()
+            edit_inventory(today)
 
     # with st.container(border=True):
     #     st.subheader("Import Inventory", divider="green")
@@ -169,14 +402,21 @@ def display_inventory():
     #         st.info("Excel import functionality will be implemented soon.")
 
 
-def display_alerts():
+def show_alert_table(alert_df):
+    """Render short alert tables as static HTML and longer ones in a scrollable grid"""
+    if len(alert_df) <= ALERT_TABLE_MAX_ROWS:
+        st.table(alert_df)
+    else:
+        st.dataframe(alert_df, use_container_width=True)
+
+
+def display_alerts(inventory_df):
     """Display alerts tab with expiry and low stock warnings"""
     st.header("Inventory Alerts")
 
     # Initialize email alert related session states
-    doctor_doc = database.collection("doctors").document(doctor_email).get()
-    if doctor_doc.exists:
-        doctor_data = doctor_doc.to_dict()
+    doctor_data = fetch_doctor(doctor_email)
+    if doctor_data is not None:
         if "alert_email" in doctor_data and doctor_data["alert_email"]:
             st.session_state["enable_email_alerts"] = True
             st.session_state["alert_email"] = doctor_data["alert_email"]
@@ -188,13 +428,6 @@ def display_alerts():
     if "email_alert_sent" not in st.session_state:
         st.session_state["email_alert_sent"] = False
 
-    # Use inventory data from session state
-    inventory_data = st.session_state.inventory_data
-
-    if not inventory_data:
-        st.info("No inventory items found. Please add items in the Inventory tab.")
-        return
-
     col1, col2 = st.columns(2)
     with col1:
         with st.container(border=True):
@@ -203,25 +436,18 @@ def display_alerts():
             global_threshold = st.slider("Global Low Stock Threshold", min_value=1, max_value=50, value=5)
 
             # Find items below threshold quantity (using item-specific threshold when available)
-            low_stock_items = []
-            for item_id, details in inventory_data.items():
-                # Get the item-specific threshold or use the global one
-                item_threshold = details.get("low_threshold", global_threshold)
-                if details["quantity"] <= item_threshold:
-                    # Extract base name from item_id
-                    item_name = item_id.split('_')[0] if '_' in item_id else item_id
-                    expiry_date = details["expiry_date"]
-                    low_stock_items.append({
-                        "Item": item_name.capitalize(),
-                        "Quantity": details["quantity"],
-                        "Threshold": item_threshold,
-                        "Expiry Date": format_date(expiry_date)
-                    })
+            item_threshold = inventory_df["low_threshold"].fillna(global_threshold).astype(int)
+            low_stock = inventory_df[inventory_df["quantity"] <= item_threshold]
 
-            if low_stock_items:
+            if not low_stock.empty:
                 st.markdown("### 🚨 Low Stock Items")
-                low_stock_df = pd.DataFrame(low_stock_items)
-                st.dataframe(low_stock_df, use_container_width=True)
+                low_stock_df = pd.DataFrame({
+                    "Item": low_stock["item_name"],
+                    "Quantity": low_stock["quantity"],
+                    "Threshold": item_threshold[low_stock.index],
+                    "Expiry Date": low_stock["expiry_label"]
+                }).reset_index(drop=True)
+                show_alert_table(low_stock_df)
 
                 # Create a visualization of low stock items
                 fig = px.bar(
@@ -244,28 +470,15 @@ def display_alerts():
             # Expiry alert settings and display
             days_threshold = st.slider("Days Until Expiry Warning", min_value=1, max_value=180, value=30)
 
-            # Calculate days until expiry for each item
-            today = datetime.today().date()
-            expiry_items = []
-
-            for item, details in inventory_data.items():
-                try:
-                    expiry_date = datetime.strptime(details["expiry_date"], "%Y-%m-%d").date()
-                    days_until_expiry = (expiry_date - today).days
-
-                    # Add items expiring within threshold days
-                    if days_until_expiry <= days_threshold:
-                        # Extract base name from item
-                        item_name = item.split('_')[0] if '_' in item else item
-                        expiry_items.append({
-                            "Item": item_name.capitalize(),
-                            "Quantity": details["quantity"],
-                            "Expiry Date": format_date(details["expiry_date"]),
-                            "Days Left": days_until_expiry
-                        })
-                except ValueError as e:
-                    st.error(f"Date format error for item '{item}': {str(e)}")
-                    continue
+            # Find items expiring within threshold days, soonest first
+            expiring = inventory_df[inventory_df["days_left"] <= days_threshold].sort_values("days_left")
+            expiry_df = pd.DataFrame({
+                "Item": expiring["item_name"],
+                "Quantity": expiring["quantity"],
+                "Expiry Date": expiring["expiry_label"],
+                "Days Left": expiring["days_left"]
+            }).reset_index(drop=True)
+            expiry_items = expiry_df.to_dict("records")
 
             # Check if we need to send email alerts
             if expiry_items and st.session_state.get("enable_email_alerts", False) and not st.session_state["email_alert_sent"]:
@@ -280,9 +493,7 @@ def display_alerts():
 
             if expiry_items:
                 st.markdown("### ⚠️ Items Near Expiry")
-                expiry_df = pd.DataFrame(expiry_items)
-                expiry_df = expiry_df.sort_values("Days Left")
-                st.dataframe(expiry_df, use_container_width=True)
+                show_alert_table(expiry_df)
 
                 # Create a visualization for expiry alerts
                 if len(expiry_df) > 0:
@@ -321,6 +532,7 @@ def display_alerts():
                     database.collection("doctors").document(doctor_email).set({
                         "alert_email": st.session_state["alert_email"]
                     }, merge=True)
+                    fetch_doctor.clear()
                 except Exception as e:
                     st.error(f"Failed to save alert settings: {str(e)}")
             else:
@@ -336,6 +548,7 @@ def display_alerts():
                     database.collection("doctors").document(doctor_email).update({
                         "alert_email": firestore.DELETE_FIELD
                     })
+                    fetch_doctor.clear()
                 except Exception as e:
                     st.error(f"Failed to update alert settings: {str(e)}")
             else:
@@ -367,6 +580,7 @@ def display_alerts():
                                 database.collection("doctors").document(doctor_email).set({
                                     "alert_email": alert_email
                                 }, merge=True)
+                                fetch_doctor.clear()
                                 # Reset email sent flag when changing email
                                 st.session_state["email_alert_sent"] = False
                                 st.success(f"Email updated: Alerts will be sent to {alert_email}")
@@ -392,304 +606,292 @@ def display_alerts():
                     st.warning("No items are near expiry. Add items that will expire soon to test the alert.")
 
 
-def display_reports():
+def select_top_rows(df, column, count, largest):
+    """Select the rows with the largest or smallest values in a column, in sorted order"""
+    values = df[column].to_numpy()
+    if largest:
+        values = -values
+    # Partition to pick the rows in O(n) and only sort the selected ones
+    if len(values) > count:
+        selected = np.argpartition(values, count - 1)[:count]
+    else:
+        selected = np.arange(len(values))
+    return df.iloc[selected[np.argsort(values[selected], kind="stable")]]
+
+
+@st.cache_data(ttl=REPORT_CACHE_TTL, max_entries=REPORT_CACHE_MAX_ENTRIES)
+def build_top_items_fig(viz_df):
+    """Build the bar chart of the top items by quantity as a figure dict"""
+    top_items = select_top_rows(viz_df, "Quantity", 10, largest=True)
+    fig = px.bar(
+        top_items,
+        x="Display Name",
+        y="Quantity",
+        title="Top Items by Quantity",
+        color="Quantity",
+        color_continuous_scale="Blues"
+    )
+    fig.update_layout(
+        xaxis_title="Item",
+        yaxis_title="Quantity",
+    )
+    return fig.to_dict()
+
+
+@st.cache_data(ttl=REPORT_CACHE_TTL, max_entries=REPORT_CACHE_MAX_ENTRIES)
+def build_expiry_fig(viz_df):
+    """Build the bar chart of the items closest to expiry as a figure dict"""
+    expiry_sorted = select_top_rows(viz_df, "Days Until Expiry", 10, largest=False)
+    fig = px.bar(
+        expiry_sorted,
+        x="Display Name",
+        y="Days Until Expiry",
+        title="Items Closest to Expiry",
+        color="Days Until Expiry",
+        color_continuous_scale="RdYlGn",
+    )
+    fig.update_layout(
+        xaxis_title="Item",
+        yaxis_title="Days Until Expiry",
+    )
+    return fig.to_dict()
+
+
+@st.cache_data(ttl=REPORT_CACHE_TTL, max_entries=REPORT_CACHE_MAX_ENTRIES)
+def build_distribution_fig(viz_df):
+    """Build the pie chart of the inventory distribution by item as a figure dict"""
+    # Draw only the largest items and group the rest so the figure payload stays small
+    if len(viz_df) > DISTRIBUTION_CHART_ITEMS:
+        top_items = select_top_rows(viz_df, "Quantity", DISTRIBUTION_CHART_ITEMS - 1, largest=True)
+        other_quantity = viz_df["Quantity"].to_numpy().sum() - top_items["Quantity"].to_numpy().sum()
+        viz_df = pd.concat([
+            top_items,
+            pd.DataFrame({"Display Name": ["Other items"], "Quantity": [other_quantity]})
+        ], ignore_index=True)
+
+    # For pie chart, use the display name with formatted date
+    fig = px.pie(
+        viz_df,
+        values="Quantity",
+        names="Display Name",
+        title="Inventory Distribution by Item",
+        hole=0.4
+    )
+    # Make the chart responsive to varying display sizes
+    fig.update_traces(textposition='inside', textinfo='percent+label')
+    # Set margins to give the chart more room
+    fig.update_layout(margin=dict(t=50, b=50))
+    return fig.to_dict()
+
+
+@st.cache_data(ttl=REPORT_CACHE_TTL, max_entries=REPORT_CACHE_MAX_ENTRIES)
+def build_report_exports(report_df):
+    """Build the CSV and JSON report downloads"""
+    # Write the CSV with Arrow's native writer straight into a byte buffer
+    csv_buffer = pa.BufferOutputStream()
+    # Quote only fields that need it, as DataFrame.to_csv does
+    pa_csv.write_csv(
+        pa.Table.from_pandas(report_df, preserve_index=False),
+        csv_buffer,
+        write_options=pa_csv.WriteOptions(quoting_style="needed")
+    )
+    return csv_buffer.getvalue().to_pybytes(), report_df.to_json(orient="records")
+
+
+def display_reports(inventory_df, records_df, today):
     """Display reports tab with analytics and export options"""
     st.header("Inventory Reports")
 
-    # Use inventory data from session state
-    inventory_data = st.session_state.inventory_data
-
-    if inventory_data:
-        # First show visualizations
-        st.subheader("Inventory Visualizations", divider="green")
+    # First show visualizations
+    st.subheader("Inventory Visualizations", divider="green")
 
+    # Charts are only built when requested so other reruns skip them entirely
+    if st.toggle("Show Visualizations", key="show_visualizations"):
         # Prepare data for visualization
-        today = datetime.today().date()
-        inventory_records = []
-
-        for item_id, details in inventory_data.items():
-            # Extract base name from item_id
-            item_name = item_id.split('_')[0] if '_' in item_id else item_id
-            item_name = item_name.capitalize()
-
-            # Format the expiry date
-            expiry_date = datetime.strptime(details["expiry_date"], "%Y-%m-%d").date()
-            formatted_date = expiry_date.strftime("%b %d, %Y")
-
-            # Create display name for charts
-            display_name = f"{item_name} ({formatted_date})"
-
-            days_until_expiry = (expiry_date - today).days
-
-            inventory_records.append({
-                "Item": item_name,  # Base name for grouping
-                "Display Name": display_name,  # Formatted name with date
-                "Quantity": details["quantity"],
-                "Days Until Expiry": days_until_expiry
-            })
-
-        viz_df = pd.DataFrame(inventory_records)
+        viz_df = pd.DataFrame({
+            "Item": inventory_df["item_name"],  # Base name for grouping
+            # Formatted name with date for charts
+            "Display Name": inventory_df["item_name"] + " (" + inventory_df["expiry_date"].dt.strftime("%b %d, %Y") + ")",
+            "Quantity": inventory_df["quantity"],
+            "Days Until Expiry": inventory_df["days_left"]
+        }).reset_index(drop=True)
 
         # Create a dashboard with visualizations
         col1, col2 = st.columns(2)
         with col1:
             # Top items by quantity
-            top_items = viz_df.sort_values("Quantity", ascending=False).head(10)
-            fig1 = px.bar(
-                top_items,
-                x="Display Name",
-                y="Quantity",
-                title="Top Items by Quantity",
-                color="Quantity",
-                color_continuous_scale="Blues"
-            )
-            fig1.update_layout(
-                xaxis_title="Item",
-                yaxis_title="Quantity",
-            )
-            st.plotly_chart(fig1, use_container_width=True)
+            st.plotly_chart(build_top_items_fig(viz_df), use_container_width=True, config=STATIC_CHART_CONFIG)
 
         with col2:
             # Items closest to expiry
-            if len(viz_df) > 0 and "Days Until Expiry" in viz_df.columns:
-                expiry_sorted = viz_df.sort_values("Days Until Expiry").head(10)
-                fig2 = px.bar(
-                    expiry_sorted,
-                    x="Display Name",
-                    y="Days Until Expiry",
-                    title="Items Closest to Expiry",
-                    color="Days Until Expiry",
-                    color_continuous_scale="RdYlGn",
-                )
-                fig2.update_layout(
-                    xaxis_title="Item",
-                    yaxis_title="Days Until Expiry",
-                )
-                st.plotly_chart(fig2, use_container_width=True)
+            st.plotly_chart(build_expiry_fig(viz_df), use_container_width=True, config=STATIC_CHART_CONFIG)
 
         # Add pie chart for inventory distribution
-        if len(inventory_data) > 0:
-            st.subheader("Inventory Distribution")
-
-            # For pie chart, use the display name with formatted date
-            fig3 = px.pie(
-                viz_df,
-                values="Quantity",
-                names="Display Name",
-                title="Inventory Distribution by Item",
-                hole=0.4
-            )
-            # Make the chart responsive to varying display sizes
-            fig3.update_traces(textposition='inside', textinfo='percent+label')
-            # Set margins to give the chart more room
-            fig3.update_layout(margin=dict(t=50, b=50))
-
-            st.plotly_chart(fig3, use_container_width=True)
-
-        # Then summary statistics
-        st.subheader("Summary Statistics", divider="blue")
-
-        # Calculate total items, units, and items expiring soon
-        total_items = len(inventory_data)
-        total_units = sum(item["quantity"] for item in inventory_data.values())
-        expiring_soon = sum(1 for item, details in inventory_data.items()
-                            if (datetime.strptime(details["expiry_date"], "%Y-%m-%d").date() - today).days <= 30)
-
-        # Create metrics row
-        metric_col1, metric_col2, metric_col3 = st.columns(3)
-        with metric_col1:
-            st.metric("Total Items", total_items)
-        with metric_col2:
-            st.metric("Total Units", total_units)
-        with metric_col3:
-            st.metric("Expiring Soon (30 days)", expiring_soon)
-
-        # Generate inventory records for export
-        if 'inventory_records' in st.session_state:
-            report_df = pd.DataFrame(st.session_state.inventory_records)
-
-            # Export options
-            st.subheader("Export Options", divider="blue")
-
-            export_col1, export_col2 = st.columns(2)
-            with export_col1:
-                csv = report_df.to_csv(index=False)
-                st.download_button(
-                    label="📄 Download CSV Report",
-                    data=csv,
-                    file_name=f"inventory_report_{datetime.today().strftime('%Y-%m-%d')}.csv",
-                    mime="text/csv",
-                    use_container_width=True
-                )
+        st.subheader("Inventory Distribution")
+        st.plotly_chart(build_distribution_fig(viz_df), use_container_width=True, config=STATIC_CHART_CONFIG)
+
+    # Then summary statistics
+    st.subheader("Summary Statistics", divider="blue")
+
+    # Calculate total items, units, and items expiring soon
+    total_items = len(inventory_df)
+    total_units = int(inventory_df["quantity"].to_numpy().sum())
+    expiring_soon = int((inventory_df["days_left"].to_numpy() <= 30).sum())
+
+    # Create metrics row
+    metric_col1, metric_col2, metric_col3 = st.columns(3)
+    with metric_col1:
+        st.metric("Total Items", total_items)
+    with metric_col2:
+        st.metric("Total Units", total_units)
+    with metric_col3:
+        st.metric("Expiring Soon (30 days)", expiring_soon)
+
+    # Export options
+    st.subheader("Export Options", divider="blue")
+
+    # Export the same inventory records shown in the Inventory tab
+    csv, json_data = build_report_exports(records_df)
+
+    export_col1, export_col2 = st.columns(2)
+    with export_col1:
+        st.download_button(
+            label="📄 Download CSV Report",
+            data=csv,
+            file_name=f"inventory_report_{today.strftime('%Y-%m-%d')}.csv",
+            mime="text/csv",
+            use_container_width=True
+        )
 
-            with export_col2:
-                json_data = report_df.to_json(orient="records")
-                st.download_button(
-                    label="📄 Download JSON Report",
-                    data=json_data,
-                    file_name=f"inventory_report_{datetime.today().strftime('%Y-%m-%d')}.json",
-                    mime="application/json",
-                    use_container_width=True
-                )
-    else:
-        st.info("No inventory data available. Add items in the Inventory tab to generate reports.")
+    with export_col2:
+        st.download_button(
+            label="📄 Download JSON Report",
+            data=json_data,
+            file_name=f"inventory_report_{today.strftime('%Y-%m-%d')}.json",
+            mime="application/json",
+            use_container_width=True
+        )
 
 
-def show_inventory():
+def show_inventory(records_df):
     """Display the current inventory status with conditional formatting"""
-    # Always refresh inventory data from session state
-    inventory_data = st.session_state.inventory_data
-
-    if inventory_data:
-        st.session_state.inventory_records = []
-        for item_id, details in inventory_data.items():
-            # Extract base name from item_id
-            item_name = item_id.split('_')[0] if '_' in item_id else item_id
-
-            # Calculate days until expiry
-            today = datetime.today().date()
-            expiry_date = datetime.strptime(details["expiry_date"], "%Y-%m-%d").date()
-            days_until_expiry = (expiry_date - today).days
-            quantity = details["quantity"]
-
-            # Get the item-specific threshold
-            item_threshold = details.get("low_threshold", 5)
-
-            # Determine status
-            status = "Normal"
-            if days_until_expiry <= 30:
-                status = "⚠️ Expiring Soon"
-            if quantity <= item_threshold:
-                status = "🚨 Low Stock"
-            if days_until_expiry <= 0:
-                status = "❌ Expired"
-            if quantity == 0:
-                status = "❌ Out of Stock"
-
-            st.session_state.inventory_records.append({
-                "Item": item_name.capitalize(),
-                "Quantity": details["quantity"],
-                "Expiry Date": format_date(details["expiry_date"]),
-                "Days Until Expiry": days_until_expiry,
-                "Status": status,
-                "ID": item_id  # Store the original ID for reference
-            })
-
-        # Create DataFrame and sort by status priority
-        inventory_df = pd.DataFrame(st.session_state.inventory_records)
-
-        # Custom sorting function to prioritize alerts
-        def status_priority(status):
-            priorities = {"❌ Expired": 0, "❌ Out of Stock": 1, "🚨 Low Stock": 2, "⚠️ Expiring Soon": 3, "Normal": 4}
-            return priorities.get(status, 4)
-
-        # Sort the DataFrame by status priority
-        inventory_df["Status Priority"] = inventory_df["Status"].apply(status_priority)
-        inventory_df = inventory_df.sort_values("Status Priority")
-        display_df = inventory_df.drop(columns=["Status Priority", "ID"])
-
-        # Initialize the active filter in session state if it doesn't exist
-        if "active_filter" not in st.session_state:
-            st.session_state.active_filter = "All Items"
+    # Status table is already sorted by status priority
+    display_df = records_df.drop(columns=["ID"])
 
-        # Apply filter to the DataFrame
-        if st.session_state.active_filter != "All Items":
-            filtered_df = display_df[display_df["Status"] == st.session_state.active_filter]
-        else:
-            filtered_df = display_df
-
-        # Reset index to show proper sequential numbering starting at 1
-        filtered_df = filtered_df.reset_index(drop=True)
-        # Add 1 to the index to start from 1 instead of 0
-        filtered_df.index = filtered_df.index + 1
-
-        # Display filtered data with conditional formatting
-        st.dataframe(
-            filtered_df,
-            use_container_width=True,
-            column_config={
-                "Quantity": st.column_config.NumberColumn(
-                    "Quantity",
-                    help="Number of units in stock",
-                    format="%d"
-                ),
-                "Days Until Expiry": st.column_config.NumberColumn(
-                    "Days Until Expiry",
-                    help="Days remaining until item expires",
-                    format="%d days"
-                ),
-                "Status": st.column_config.TextColumn(
-                    "Status",
-                    help="Inventory status indicator"
-                )
-            },
-            height=400
-        )
+    # Initialize the active filter in session state if it doesn't exist
+    if "active_filter" not in st.session_state:
+        st.session_state.active_filter = "All Items"
 
-        st.write("### Filter Inventory")
-        filter_col1, filter_col2, filter_col3, filter_col4, filter_col5, filter_col6 = st.columns(6)
+    # Apply filter to the DataFrame
+    if st.session_state.active_filter != "All Items":
+        filtered_df = display_df[display_df["Status"] == st.session_state.active_filter]
+    else:
+        filtered_df = display_df
+
+    # Reset index to show proper sequential numbering starting at 1
+    filtered_df = filtered_df.reset_index(drop=True)
+    # Add 1 to the index to start from 1 instead of 0
+    filtered_df.index = filtered_df.index + 1
+
+    # Only send the current page of a large inventory to the browser
+    page_count = -(-len(filtered_df) // INVENTORY_PAGE_SIZE)
+    if page_count > 1:
+        page = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1)
+        page_start = (page - 1) * INVENTORY_PAGE_SIZE
+        page_df = filtered_df.iloc[page_start:page_start + INVENTORY_PAGE_SIZE]
+        st.caption(f"Showing items {page_start + 1}-{page_start + len(page_df)} of {len(filtered_df)}")
+    else:
+        page_df = filtered_df
+
+    # Display filtered data with conditional formatting
+    st.dataframe(
+        page_df,
+        use_container_width=True,
+        column_config={
+            "Quantity": st.column_config.NumberColumn(
+                "Quantity",
+                help="Number of units in stock",
+                format="%d"
+            ),
+            "Days Until Expiry": st.column_config.NumberColumn(
+                "Days Until Expiry",
+                help="Days remaining until item expires",
+                format="%d days"
+            ),
+            "Status": st.column_config.TextColumn(
+                "Status",
+                help="Inventory status indicator"
+            )
+        },
+        height=400
+    )
 
-        # Display filter status
-        if st.session_state.active_filter != "All Items":
-            st.info(f"Showing {len(filtered_df)} items with status: {st.session_state.active_filter}")
-        else:
-            st.info(f"Showing all {len(filtered_df)} items")
-
-        # Button styling function to highlight active filter
-        def get_button_style(filter_name):
-            if st.session_state.active_filter == filter_name:
-                return "primary"
-            return "secondary"
-
-        # Create filter buttons
-        with filter_col1:
-            if st.button("All Items", key="all_items", use_container_width=True, type=get_button_style("All Items")):
-                st.session_state.active_filter = "All Items"
-                st.rerun()
+    st.write("### Filter Inventory")
+    filter_col1, filter_col2, filter_col3, filter_col4, filter_col5, filter_col6 = st.columns(6)
 
-        with filter_col2:
-            if st.button("Normal", key="normal", use_container_width=True, type=get_button_style("Normal")):
-                st.session_state.active_filter = "Normal"
-                st.rerun()
+    # Display filter status
+    if st.session_state.active_filter != "All Items":
+        st.info(f"Showing {len(filtered_df)} items with status: {st.session_state.active_filter}")
+    else:
+        st.info(f"Showing all {len(filtered_df)} items")
 
-        with filter_col3:
-            if st.button("🚨 Low Stock", key="low_stock", use_container_width=True, type=get_button_style("🚨 Low Stock")):
-                st.session_state.active_filter = "🚨 Low Stock"
-                st.rerun()
+    # Button styling function to highlight active filter
+    def get_button_style(filter_name):
+        if st.session_state.active_filter == filter_name:
+            return "primary"
+        return "secondary"
 
-        with filter_col4:
-            if st.button("⚠️ Expiring Soon", key="expiring_soon", use_container_width=True, type=get_button_style("⚠️ Expiring Soon")):
-                st.session_state.active_filter = "⚠️ Expiring Soon"
-                st.rerun()
+    # Create filter buttons
+    with filter_col1:
+        if st.button("All Items", key="all_items", use_container_width=True, type=get_button_style("All Items")):
+            st.session_state.active_filter = "All Items"
+            st.rerun()
 
-        with filter_col5:
-            if st.button("❌ Expired", key="expired", use_container_width=True, type=get_button_style("❌ Expired")):
-                st.session_state.active_filter = "❌ Expired"
-                st.rerun()
+    with filter_col2:
+        if st.button("Normal", key="normal", use_container_width=True, type=get_button_style("Normal")):
+            st.session_state.active_filter = "Normal"
+            st.rerun()
 
-        with filter_col6:
-            if st.button("❌ Out of Stock", key="out_of_stock", use_container_width=True, type=get_button_style("❌ Out of Stock")):
-                st.session_state.active_filter = "❌ Out of Stock"
-                st.rerun()
-    else:
-        st.info("Inventory Status: No items currently in stock")
+    with filter_col3:
+        if st.button("🚨 Low Stock", key="low_stock", use_container_width=True, type=get_button_style("🚨 Low Stock")):
+            st.session_state.active_filter = "🚨 Low Stock"
+            st.rerun()
+
+    with filter_col4:
+        if st.button("⚠️ Expiring Soon", key="expiring_soon", use_container_width=True, type=get_button_style("⚠️ Expiring Soon")):
+            st.session_state.active_filter = "⚠️ Expiring Soon"
+            st.rerun()
+
+    with filter_col5:
+        if st.button("❌ Expired", key="expired", use_container_width=True, type=get_button_style("❌ Expired")):
+            st.session_state.active_filter = "❌ Expired"
+            st.rerun()
+
+    with filter_col6:
+        if st.button("❌ Out of Stock", key="out_of_stock", use_container_width=True, type=get_button_style("❌ Out of Stock")):
+            st.session_state.active_filter = "❌ Out of Stock"
+            st.rerun()
 
 
-def add_items():
+def add_items(today):
     """Add new items to inventory or update existing items"""
-    column_first, column_second, column_third = st.columns(3)
-    with column_first:
-        item_name = st.text_input("Item Name", placeholder="Enter item name").strip().lower()
+    # Use a form so that editing the inputs does not rerun the whole page
+    with st.form("add_item_form", border=False):
+        column_first, column_second, column_third = st.columns(3)
+        with column_first:
+            item_name = st.text_input("Item Name", placeholder="Enter item name").strip().lower()
 
-    with column_second:
-        item_quantity = st.number_input("Quantity", min_value=1, step=1)
+        with column_second:
+            item_quantity = st.number_input("Quantity", min_value=1, step=1)
 
-    with column_third:
-        low_threshold = st.number_input("Low Stock Threshold", min_value=1, value=5, step=1)
+        with column_third:
+            low_threshold = st.number_input("Low Stock Threshold", min_value=1, value=5, step=1)
 
-    expiry_date = st.date_input("Expiry Date", min_value=datetime.today().date())
+        expiry_date = st.date_input("Expiry Date", min_value=today)
 
-    if st.button("➕ Add Item", use_container_width=True):
+        add_button = st.form_submit_button("➕ Add Item", use_container_width=True)
+
+    if add_button:
         if item_name:
             expiry_string = expiry_date.strftime("%Y-%m-%d")
 
@@ -697,27 +899,26 @@ def add_items():
             item_id = f"{item_name}_{expiry_string}"
 
             # Check if item with same name and expiry date already exists
-            if item_id in st.session_state.inventory_data:
+            if item_id in st.session_state.item_ids:
                 st.warning(f"Item '{item_name}' with the same expiry date already exists. Please edit the existing item instead.")
             else:
                 # Store the item with its unique ID
-                success = store_stock(item_id, item_quantity, expiry_string, low_threshold)
+                success = store_stock(item_id, item_quantity, datetime.combine(expiry_date, time.min), low_threshold)
                 if success:
                     st.success(f"Item Added: {item_quantity} units of '{item_name}' (Expires: {format_date(expiry_string)}) added to inventory")
 
                     # Reset email sent flag when adding new items that might trigger alerts
                     st.session_state["email_alert_sent"] = False
-                    # Force refresh of inventory data
-                    st.session_state.inventory_data = fetch_stock()
                     st.rerun()
         else:
             st.error("Entry Error: Please enter a valid item name")
 
 
-def edit_inventory():
+def edit_inventory(today):
     """Edit or remove items from inventory"""
-    base_item_name = st.text_input("Item to Edit", placeholder="Enter item name to edit").strip().lower()
-    find_edit_button = st.button("🔍 Find Item", use_container_width=True)
+    with st.form("find_item_form", border=False):
+        base_item_name = st.text_input("Item to Edit", placeholder="Enter item name to edit").strip().lower()
+        find_edit_button = st.form_submit_button("🔍 Find Item", use_container_width=True)
 
     # Track if we're in search mode or edit mode
     if "edit_search_mode" not in st.session_state:
@@ -730,28 +931,18 @@ def edit_inventory():
         st.session_state.pop("matching_items", None)
         st.session_state.edit_search_mode = True
 
-        # Find all items that start with the base name
-        matching_items = {}
-        for item_id, details in st.session_state.inventory_data.items():
-            # Extract the base name from the item_id (removing the _date suffix)
-            if '_' in item_id:
-                name_part = item_id.split('_')[0]
-                if name_part == base_item_name:
-                    # Add to matching items with expiry date as key info
-                    matching_items[item_id] = {
-                        "name": name_part,
-                        "expiry_date": details["expiry_date"],
-                        "quantity": details["quantity"],
-                        "low_threshold": details.get("low_threshold", 5)
-                    }
-            elif item_id == base_item_name:
-                # Handle items without expiry date in ID (legacy format)
-                matching_items[item_id] = {
-                    "name": item_id,
-                    "expiry_date": details["expiry_date"],
-                    "quantity": details["quantity"],
-                    "low_threshold": details.get("low_threshold", 5)
-                }
+        # Find all items whose base name matches (items without a _date suffix use the whole ID)
+        inventory_data = st.session_state.inventory_data
+        base_names = inventory_data.index.astype(str).str.split("_").str[0]
+        matching_items = {
+            item.Index: {
+                "name": base_item_name,
+                "expiry_date": item.expiry_date,
+                "quantity": int(item.quantity),
+                "low_threshold": int(item.low_threshold) if pd.notna(item.low_threshold) else 5
+            }
+            for item in inventory_data[base_names == base_item_name].itertuples()
+        }
 
         # No items found
         if not matching_items:
@@ -794,8 +985,8 @@ def edit_inventory():
             st.session_state.edit_item_id = edit_item
 
         # Handle item editing
-        if edit_item and edit_item in st.session_state.inventory_data:
-            handle_item_editing(edit_item)
+        if edit_item and edit_item in st.session_state.item_ids:
+            handle_item_editing(edit_item, today)
         elif "edit_item_id" in st.session_state:
             # Item no longer exists (probably deleted)
             st.error("The selected item no longer exists in the inventory.")
@@ -804,9 +995,9 @@ def edit_inventory():
             st.session_state.pop("matching_items", None)
 
 
-def handle_item_editing(edit_item):
+def handle_item_editing(edit_item, today):
     """Handle the editing interface for a specific inventory item"""
-    item_details = st.session_state.inventory_data[edit_item]
+    item_details = st.session_state.inventory_data.loc[edit_item]
     base_name = edit_item.split('_')[0] if '_' in edit_item else edit_item
 
     # Display current item information
@@ -819,14 +1010,13 @@ def handle_item_editing(edit_item):
         new_quantity = st.number_input(
             "New Quantity",
             min_value=0,
-            value=item_details['quantity'],
+            value=int(item_details['quantity']),
             step=1
         )
 
     with edit_col2:
         try:
-            current_expiry = datetime.strptime(item_details['expiry_date'], "%Y-%m-%d").date()
-            today = datetime.today().date()
+            current_expiry = item_details['expiry_date'].date()
             if current_expiry < today:
                 current_expiry = today
 
@@ -837,13 +1027,13 @@ def handle_item_editing(edit_item):
             )
         except Exception as e:
             st.error(f"Date validation error: {e}")
-            new_expiry = datetime.today().date()
+            new_expiry = today
 
     with edit_col3:
         new_threshold = st.number_input(
             "New Low Stock Threshold",
             min_value=1,
-            value=item_details.get('low_threshold', 5),
+            value=int(item_details['low_threshold']) if pd.notna(item_details['low_threshold']) else 5,
             step=1
         )
 
@@ -858,17 +1048,15 @@ def handle_item_editing(edit_item):
 
             if new_item_id != edit_item:
                 # Check if an item with the new ID already exists
-                if new_item_id in st.session_state.inventory_data:
+                if new_item_id in st.session_state.item_ids:
                     st.error(f"Cannot update: An item with name '{base_name}' and expiry date {format_date(expiry_string)} already exists")
                 else:
-                    # Create new item with updated expiry
-                    stock_collection.document(new_item_id).set({
+                    # Create new item with updated expiry and delete the old one
+                    replace_stock(edit_item, new_item_id, {
                         "quantity": new_quantity,
-                        "expiry_date": expiry_string,
+                        "expiry_date": datetime.combine(new_expiry, time.min),
                         "low_threshold": new_threshold
-                    }, merge=True)
-                    # Delete old item
-                    stock_collection.document(edit_item).delete()
+                    })
                     st.success(f"Item Updated with new expiry: '{base_name}' has been updated successfully")
 
                     # Reset email sent flag when editing items that might trigger alerts
@@ -876,16 +1064,16 @@ def handle_item_editing(edit_item):
                     # Clear session state
                     st.session_state.pop("edit_item_id", None)
                     st.session_state.pop("matching_items", None)
-                    # Force refresh of inventory data
-                    st.session_state.inventory_data = fetch_stock()
                     st.rerun()
             else:
                 # Update existing item
-                stock_collection.document(edit_item).set({
+                item_data = {
                     "quantity": new_quantity,
-                    "expiry_date": expiry_string,
+                    "expiry_date": datetime.combine(new_expiry, time.min),
                     "low_threshold": new_threshold
-                }, merge=True)
+                }
+                get_stock_collection(doctor_email).document(edit_item).set(item_data, merge=True)
+                update_stock_cache(edit_item, item_data)
                 st.success(f"Item Updated: '{base_name}' has been updated successfully")
 
                 # Reset email sent flag when editing items that might trigger alerts
@@ -893,15 +1081,14 @@ def handle_item_editing(edit_item):
                 # Clear session state
                 st.session_state.pop("edit_item_id", None)
                 st.session_state.pop("matching_items", None)
-                # Force refresh of inventory data
-                st.session_state.inventory_data = fetch_stock()
                 st.rerun()
 
     with col2:
         if st.button("🗑️ Delete Item", use_container_width=True, key="delete_item"):
             # Directly delete the item and clear state in one go
             try:
-                stock_collection.document(edit_item).delete()
+                get_stock_collection(doctor_email).document(edit_item).delete()
+                update_stock_cache(edit_item)
                 st.success(f"Item Removed: '{base_name}' (Expires: {format_date(item_details['expiry_date'])}) has been deleted from inventory")
 
                 # Reset email sent flag when deleting items that might change alert status
@@ -910,9 +1097,6 @@ def handle_item_editing(edit_item):
                 # Clear all session state variables related to editing
                 st.session_state.pop("edit_item_id", None)
                 st.session_state.pop("matching_items", None)
-
-                # Force refresh of inventory data
-                st.session_state.inventory_data = fetch_stock()
                 st.rerun()
             except Exception as e:
                 st.error(f"Error deleting item: {str(e)}")